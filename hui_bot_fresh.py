@@ -21,6 +21,7 @@ CONFIG_FILE = "config.json"
 
 REPORT_HOUR = 8                 # 08:00 gửi báo cáo tháng (chỉ mùng 1)
 REMINDER_TICK_SECONDS = 60      # vòng lặp check nhắc hẹn
+SNAPSHOT_EVERY = 50             # số sự kiện/dây giữa 2 snapshot (giới hạn chi phí replay)
 
 ISO_FMT = "%Y-%m-%d"   # lưu DB
 
@@ -28,6 +29,10 @@ ISO_FMT = "%Y-%m-%d"   # lưu DB
 def strip_accents(s: str) -> str:
     return ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
 
+def norm_name(s: str) -> str:
+    """Chuẩn hoá tên dây để tìm kiếm: bỏ dấu (kể cả đ/Đ), chữ thường."""
+    return strip_accents(s or "").replace("đ", "d").replace("Đ", "D").lower().strip()
+
 def parse_iso(s: str) -> datetime:
     return datetime.strptime(s, ISO_FMT)
 
@@ -111,6 +116,26 @@ def init_db():
         UNIQUE(line_id, k),
         FOREIGN KEY(line_id) REFERENCES lines(id) ON DELETE CASCADE
     )""")
+    # Nhật ký sự kiện chỉ-ghi-thêm: lines/rounds là projection của bảng này
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS events(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        line_id INTEGER NOT NULL,
+        ts TEXT NOT NULL,
+        actor TEXT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL
+    )""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_events_line ON events(line_id, id)")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS snapshots(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        line_id INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,
+        ts TEXT NOT NULL,
+        state TEXT NOT NULL
+    )""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_line ON snapshots(line_id, event_id)")
     conn.commit(); conn.close()
 
 def ensure_schema():
@@ -125,8 +150,198 @@ def ensure_schema():
     ]:
         try: cur.execute(f"ALTER TABLE lines ADD COLUMN {col} {decl}")
         except Exception: pass
+    # Chỉ mục FTS5 cho tên dây (rowid = lines.id, name_norm = norm_name(name))
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(
+            name_norm, tokenize='unicode61 remove_diacritics 2'
+        )""")
+        missing = cur.execute(
+            "SELECT id, name FROM lines WHERE id NOT IN (SELECT rowid FROM lines_fts)"
+        ).fetchall()
+        for line_id, name in missing:
+            fts_sync_line(conn, line_id, name)
+    except sqlite3.OperationalError:
+        pass  # SQLite không có FTS5 → search_lines quét trực tiếp bảng lines
+    for line_id in migrate_to_events(conn):
+        rebuild_projection(conn, line_id)
+    conn.commit(); conn.close()
+
+def rebuild_projections():
+    """Bảo trì: dựng lại lines/rounds của mọi dây từ nhật ký (bật bằng REBUILD_PROJECTIONS=1 khi khởi động)."""
+    conn = db()
+    for (line_id,) in conn.execute("SELECT DISTINCT line_id FROM events").fetchall():
+        rebuild_projection(conn, line_id)
     conn.commit(); conn.close()
 
+def fts_sync_line(conn, line_id: int, name: str):
+    """Ghi (hoặc ghi đè) tên đã chuẩn hoá của một dây vào lines_fts. Gọi sau mỗi INSERT/UPDATE tên."""
+    try:
+        conn.execute("DELETE FROM lines_fts WHERE rowid=?", (line_id,))
+        conn.execute("INSERT INTO lines_fts(rowid, name_norm) VALUES(?,?)", (line_id, norm_name(name)))
+    except sqlite3.OperationalError:
+        pass
+
+def search_lines(query: str, limit: int = 10):
+    """Tìm dây theo tên (không dấu, khớp tiền tố từng từ). Trả về [(id, name, status), ...]."""
+    tokens = re.findall(r"\w+", norm_name(query))
+    if not tokens: return []
+    conn = db()
+    try:
+        match = " ".join(f'"{t}"*' for t in tokens)
+        rows = conn.execute(
+            "SELECT l.id, l.name, l.status FROM lines_fts f JOIN lines l ON l.id = f.rowid "
+            "WHERE lines_fts MATCH ? ORDER BY f.rank, l.id DESC LIMIT ?",
+            (match, limit)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+        for (line_id, name, status) in conn.execute("SELECT id, name, status FROM lines ORDER BY id DESC"):
+            words = re.findall(r"\w+", norm_name(name))
+            if all(any(w.startswith(t) for w in words) for t in tokens):
+                rows.append((line_id, name, status))
+            if len(rows) >= limit: break
+    conn.close()
+    return rows
+
+# ---------- EVENT LOG ----------
+# Các loại sự kiện:
+#   line_created {name, period_days, start_date, ...}   round_set {k, bid, round_date, prev_bid}
+#   remind_set {remind_hour, remind_min}                 status_set {status}
+LINE_STATE_COLS = ["name","period_days","start_date","legs","contrib","bid_type","bid_value","status",
+                   "created_at","base_rate","cap_rate","thau_rate","remind_hour","remind_min"]
+
+def now_ts() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _fold_event(state: dict, kind: str, p: dict) -> dict:
+    """Áp một sự kiện lên state {"line": dict|None, "bids": {k: [bid, round_date]}} (thuần, không chạm DB)."""
+    if kind == "line_created":
+        state["line"] = {col: p.get(col) for col in LINE_STATE_COLS}
+    elif state["line"] is None:
+        return state
+    elif kind == "round_set":
+        state["bids"][int(p["k"])] = [int(p["bid"]), p.get("round_date")]
+    elif kind == "remind_set":
+        state["line"]["remind_hour"] = int(p["remind_hour"]); state["line"]["remind_min"] = int(p["remind_min"])
+    elif kind == "status_set":
+        state["line"]["status"] = p["status"]
+    return state
+
+def _apply_event(conn, line_id: int, kind: str, p: dict):
+    """Cập nhật projection (lines/rounds) theo một sự kiện vừa ghi."""
+    if kind == "line_created":
+        cols = ["id"] + LINE_STATE_COLS
+        conn.execute(f"INSERT INTO lines({','.join(cols)}) VALUES({','.join('?'*len(cols))})",
+                     [line_id] + [p.get(col) for col in LINE_STATE_COLS])
+        fts_sync_line(conn, line_id, p["name"])
+    elif kind == "round_set":
+        conn.execute("""
+            INSERT INTO rounds(line_id,k,bid,round_date) VALUES(?,?,?,?)
+            ON CONFLICT(line_id,k) DO UPDATE SET bid=excluded.bid, round_date=excluded.round_date
+        """, (line_id, int(p["k"]), int(p["bid"]), p.get("round_date")))
+    elif kind == "remind_set":
+        conn.execute("UPDATE lines SET remind_hour=?, remind_min=? WHERE id=?",
+                     (int(p["remind_hour"]), int(p["remind_min"]), line_id))
+    elif kind == "status_set":
+        conn.execute("UPDATE lines SET status=? WHERE id=?", (p["status"], line_id))
+
+def append_event(conn, line_id: int, kind: str, payload: dict, actor: Optional[str] = None, ts: Optional[str] = None) -> int:
+    """Ghi sự kiện (không bao giờ sửa/xoá), cập nhật projection, và chụp snapshot mỗi SNAPSHOT_EVERY sự kiện.
+    Không commit — người gọi commit cùng transaction."""
+    cur = conn.execute("INSERT INTO events(line_id,ts,actor,kind,payload) VALUES(?,?,?,?,?)",
+                       (line_id, ts or now_ts(), actor, kind, json.dumps(payload, ensure_ascii=False)))
+    event_id = cur.lastrowid
+    _apply_event(conn, line_id, kind, payload)
+    last_snap = conn.execute("SELECT COALESCE(MAX(event_id),0) FROM snapshots WHERE line_id=?", (line_id,)).fetchone()[0]
+    pending = conn.execute("SELECT COUNT(*) FROM events WHERE line_id=? AND id>?", (line_id, last_snap)).fetchone()[0]
+    if pending >= SNAPSHOT_EVERY:
+        state = replay_line(conn, line_id)
+        max_ts = conn.execute("SELECT MAX(ts) FROM events WHERE line_id=? AND id<=?", (line_id, event_id)).fetchone()[0]
+        conn.execute("INSERT INTO snapshots(line_id,event_id,ts,state) VALUES(?,?,?,?)",
+                     (line_id, event_id, max_ts, json.dumps(state, ensure_ascii=False)))
+    return event_id
+
+def replay_line(conn, line_id: int, before_ts: Optional[str] = None) -> dict:
+    """Dựng lại state của dây từ snapshot gần nhất + các sự kiện sau nó.
+    before_ts: chỉ tính sự kiện có ts < before_ts (xem dây “tại một ngày” trong quá khứ)."""
+    cutoff = before_ts or "9999"
+    # snapshot.ts = ts lớn nhất trong các sự kiện nó gộp → dùng được nếu mọi sự kiện đó < cutoff
+    snap = conn.execute(
+        "SELECT event_id, state FROM snapshots WHERE line_id=? AND ts<? ORDER BY event_id DESC LIMIT 1",
+        (line_id, cutoff)
+    ).fetchone()
+    state = {"line": None, "bids": {}}; after = 0
+    if snap:
+        after = snap[0]
+        raw = json.loads(snap[1])
+        state = {"line": raw["line"], "bids": {int(k): v for k, v in raw["bids"].items()}}
+    rows = conn.execute(
+        "SELECT kind, payload FROM events WHERE line_id=? AND id>? AND ts<? ORDER BY id",
+        (line_id, after, cutoff)
+    ).fetchall()
+    for kind, payload in rows:
+        _fold_event(state, kind, json.loads(payload))
+    return state
+
+def rebuild_projection(conn, line_id: int):
+    """Ghi đè lines/rounds của một dây bằng kết quả replay (giữ nguyên last_remind_iso)."""
+    state = replay_line(conn, line_id)
+    if state["line"] is None: return
+    line = state["line"]
+    if conn.execute("SELECT 1 FROM lines WHERE id=?", (line_id,)).fetchone():
+        conn.execute(f"UPDATE lines SET {', '.join(col + '=?' for col in LINE_STATE_COLS)} WHERE id=?",
+                     [line[col] for col in LINE_STATE_COLS] + [line_id])
+    else:
+        _apply_event(conn, line_id, "line_created", line)
+    conn.execute("DELETE FROM rounds WHERE line_id=?", (line_id,))
+    conn.executemany("INSERT INTO rounds(line_id,k,bid,round_date) VALUES(?,?,?,?)",
+                     [(line_id, k, bid, rdate) for k, (bid, rdate) in sorted(state["bids"].items())])
+
+def migrate_to_events(conn) -> list:
+    """DB cũ (trước khi có nhật ký): sinh sự kiện gốc cho các dây chưa có sự kiện nào, trả về các mã dây đã sinh.
+    Thời điểm lấy theo created_at của dây và round_date (hoặc ngày dự kiến) của kỳ — chỉ là ước lượng,
+    không vượt quá thời điểm migrate. Trạng thái khác OPEN được ghi thành status_set riêng tại thời điểm migrate."""
+    migrated_at = now_ts()
+    rows = conn.execute(
+        f"SELECT id, {', '.join(LINE_STATE_COLS)} FROM lines "
+        "WHERE id NOT IN (SELECT DISTINCT line_id FROM events) ORDER BY id"
+    ).fetchall()
+    for r in rows:
+        line_id, line = r[0], dict(zip(LINE_STATE_COLS, r[1:]))
+        status = line["status"] or "OPEN"
+        created_ts = min(str(line["created_at"] or migrated_at)[:19], migrated_at)
+        conn.execute("INSERT INTO events(line_id,ts,actor,kind,payload) VALUES(?,?,?,?,?)",
+                     (line_id, created_ts, "migrate", "line_created",
+                      json.dumps(dict(line, status="OPEN"), ensure_ascii=False)))
+        for k, bid, rdate in conn.execute("SELECT k, bid, round_date FROM rounds WHERE line_id=? ORDER BY k", (line_id,)).fetchall():
+            ts = min(max(created_ts, rdate or to_iso_str(k_date(line, int(k)))), migrated_at)
+            conn.execute("INSERT INTO events(line_id,ts,actor,kind,payload) VALUES(?,?,?,?,?)",
+                         (line_id, ts, "migrate", "round_set",
+                          json.dumps({"k": int(k), "bid": int(bid), "round_date": rdate, "prev_bid": None})))
+        if status != "OPEN":
+            conn.execute("INSERT INTO events(line_id,ts,actor,kind,payload) VALUES(?,?,?,?,?)",
+                         (line_id, migrated_at, "migrate", "status_set", json.dumps({"status": status})))
+    return [r[0] for r in rows]
+
+def load_events(line_id: int, limit: int = 30):
+    conn = db()
+    rows = conn.execute(
+        "SELECT ts, actor, kind, payload FROM events WHERE line_id=? ORDER BY id DESC LIMIT ?",
+        (line_id, limit)
+    ).fetchall()
+    conn.close()
+    return [(ts, actor, kind, json.loads(payload)) for (ts, actor, kind, payload) in reversed(rows)]
+
+def load_line_as_of(line_id: int, day: datetime):
+    """State của dây tính đến hết ngày `day` → (line dict có 'id' hoặc None, bids {k: bid})."""
+    conn = db()
+    state = replay_line(conn, line_id, before_ts=to_iso_str(day + timedelta(days=1)))
+    conn.close()
+    if state["line"] is None: return None, {}
+    line = dict(state["line"], id=line_id)
+    return line, {k: int(v[0]) for k, v in state["bids"].items()}
+
 def load_cfg():
     if os.path.exists(CONFIG_FILE):
         try: return json.load(open(CONFIG_FILE, "r", encoding="utf-8"))
@@ -207,13 +422,16 @@ def help_text() -> str:
         "   💡 Thiếu tham số? Gõ **/tao** trống, bot sẽ gửi **một biểu mẫu** để bạn điền 1 lần là xong.\n\n"
         "2) Nhập thăm kỳ:\n"
         "   /tham <mã_dây> <kỳ> <số_tiền_thăm> [DD-MM-YYYY]\n"
-        "   Ví dụ: ` /tham 1 1 2tr 10-10-2025 `\n\n"
+        "   Ví dụ: ` /tham 1 1 2tr 10-10-2025 ` hoặc ` /tham hui 10tr 1 2tr `\n\n"
         "3) Đặt giờ nhắc riêng:\n"
         "   /hen <mã_dây> <HH:MM>  (ví dụ: /hen 1 07:45)\n\n"
-        "4) Danh sách / Tóm tắt / Gợi ý hốt:\n"
+        "4) Danh sách / Tìm / Tóm tắt / Gợi ý hốt:\n"
         "   /danhsach\n"
-        "   /tomtat <mã_dây>\n"
-        "   /hottot <mã_dây> [Roi%|Lãi]\n\n"
+        "   /tim <từ_khoá>  (tìm theo tên, không cần dấu)\n"
+        "   /tomtat <mã_dây> [DD-MM-YYYY]  (kèm ngày = xem lại dây tại ngày đó)\n"
+        "   /lichsu <mã_dây>  (lịch sử thay đổi: thăm, giờ nhắc, trạng thái)\n"
+        "   /hottot <mã_dây> [Roi%|Lãi]\n"
+        "   💡 <mã_dây> có thể thay bằng tên dây, vd: /tomtat hui thang co ba\n\n"
         "5) Đóng dây: /dong <mã_dây>\n\n"
         "6) Cài nơi nhận báo cáo & nhắc (gửi vào chat hiện tại nếu không nhập):\n"
         "   /baocao [chat_id]\n\n"
@@ -286,7 +504,7 @@ def tao_wizard_text() -> str:
 def tham_wizard_text() -> str:
     return (
         "🧩 **Nhập thăm nhanh** – trả lời **một tin** theo thứ tự (mỗi dòng hoặc `|`):\n"
-        "1) Mã dây (vd: 1)\n2) Kỳ (vd: 3)\n3) Số tiền thăm (vd: 2tr, 750k, ...)\n4) Ngày DD-MM-YYYY (trống = hôm nay)\n\n"
+        "1) Mã dây hoặc tên dây (vd: 1)\n2) Kỳ (vd: 3)\n3) Số tiền thăm (vd: 2tr, 750k, ...)\n4) Ngày DD-MM-YYYY (trống = hôm nay)\n\n"
         "Ví dụ: `1 | 3 | 2tr | 10-10-2025`\n"
         "🚫 Thoát: /huy"
     )
@@ -298,6 +516,7 @@ async def cmd_lenh(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("💰 Nhập thăm (wizard)", callback_data="wiz:tham")],
         [InlineKeyboardButton("⏰ Đặt giờ nhắc (wizard)", callback_data="wiz:hen")],
         [InlineKeyboardButton("📋 Danh sách dây", callback_data="show:danhsach")],
+        [InlineKeyboardButton("🔍 Tìm dây theo tên", callback_data="ask:tim")],
         [InlineKeyboardButton("📊 Tóm tắt dây", callback_data="ask:tomtat")],
         [InlineKeyboardButton("💡 Gợi ý hốt (Roi%|Lãi)", callback_data="ask:hottot")],
     ]
@@ -322,6 +541,8 @@ async def on_menu_callback(cbq: CallbackQuery, ctx: ContextTypes.DEFAULT_TYPE):
         await cbq.message.reply_text("Cú pháp: /hen <mã_dây> <HH:MM>  (VD: /hen 1 07:45)")
     elif data == "show:danhsach":
         await cbq.message.reply_text(list_text(), parse_mode="Markdown")
+    elif data == "ask:tim":
+        await cbq.message.reply_text("Nhập: /tim <từ_khoá>  (VD: /tim hui 10tr)")
     elif data == "ask:tomtat":
         await cbq.message.reply_text("Nhập: /tomtat <mã_dây>")
     elif data == "ask:hottot":
@@ -366,17 +587,15 @@ async def _create_line_and_reply(upd: Update, name, kind, start_user, legs, cont
     if not (0 <= thau_rate <= 100): raise ValueError("đầu thảo% trong [0..100]")
 
     conn = db()
-    conn.execute(
-        """INSERT INTO lines(name,period_days,start_date,legs,contrib,
-                             bid_type,bid_value,status,created_at,
-                             base_rate,cap_rate,thau_rate,remind_hour,remind_min,last_remind_iso)
-           VALUES(?,?,?,?,?,'dynamic',0,'OPEN',?, ?, ?, ?, 8, 0, NULL)""",
-        (name, period_days, start_iso, legs, contrib_i,
-         datetime.now().isoformat(), base_rate, cap_rate, thau_rate)
-    )
-    conn.commit()
-    line_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    conn.close()
+    line_id = conn.execute(
+        "SELECT MAX(COALESCE((SELECT MAX(id) FROM lines),0), COALESCE((SELECT MAX(line_id) FROM events),0)) + 1"
+    ).fetchone()[0]
+    append_event(conn, line_id, "line_created", {
+        "name": name, "period_days": period_days, "start_date": start_iso, "legs": legs, "contrib": contrib_i,
+        "bid_type": "dynamic", "bid_value": 0, "status": "OPEN", "created_at": datetime.now().isoformat(),
+        "base_rate": base_rate, "cap_rate": cap_rate, "thau_rate": thau_rate, "remind_hour": 8, "remind_min": 0
+    }, actor=_actor(upd))
+    conn.commit(); conn.close()
 
     await upd.message.reply_text(
         f"✅ Tạo dây #{line_id} ({name}) — {'Hụi Tuần' if period_days==7 else 'Hụi Tháng'}\n"
@@ -387,24 +606,89 @@ async def _create_line_and_reply(upd: Update, name, kind, start_user, legs, cont
     )
 
 # ----- THĂM -----
+def _actor(upd: Update) -> Optional[str]:
+    u = upd.effective_user
+    if not u: return None
+    return f"@{u.username}" if u.username else f"{u.full_name} ({u.id})"
+
 def _int_like(s: str) -> int:
     m = re.search(r"-?\d+", s or "")
     if not m: raise ValueError(f"Không phải số: {s}")
     return int(m.group(0))
 
+def resolve_line_id(text: str) -> Tuple[Optional[int], str]:
+    """Nhận mã dây (`1`, `#1`) hoặc tên dây (`hui 10tr`) → (line_id, "") hoặc (None, thông báo lỗi)."""
+    s = (text or "").strip()
+    if re.fullmatch(r"#?\d+", s):
+        return int(s.lstrip("#")), ""
+    rows = search_lines(s, limit=6)
+    if not rows:
+        return None, f"❌ Không tìm thấy dây nào khớp “{s}”."
+    exact = [r for r in rows if norm_name(r[1]) == norm_name(s)]
+    if len(rows) == 1 or len(exact) == 1:
+        return (exact or rows)[0][0], ""
+    options = "\n".join(f"• #{r[0]} · {r[1]} · {r[2]}" for r in rows[:5])
+    return None, f"⚠️ “{s}” khớp nhiều dây, hãy dùng mã dây:\n{options}"
+
+def _looks_like_date(s: str) -> bool:
+    try: _smart_parse_dmy(s); return True
+    except Exception: return False
+
+def _is_round(s: str) -> bool:
+    return re.fullmatch(r"\d+", s or "") is not None
+
+def _is_money(s: str) -> bool:
+    try: parse_money(s); return True
+    except Exception: return False
+
+def _is_hhmm(s: str) -> bool:
+    return re.fullmatch(r"\d{1,2}:\d{2}", s or "") is not None
+
+def _is_metric(s: str) -> bool:
+    return strip_accents((s or "").strip().lower().replace("%", "")) in ("roi", "lai")
+
+def _is_line_name(text: str) -> bool:
+    return any(norm_name(r[1]) == norm_name(text) for r in search_lines(text, limit=6))
+
+def split_line_args(args, tail: list) -> Optional[Tuple[str, list]]:
+    """Tách `<mã_dây|tên> <tham số...>` → (mã hoặc tên dây, [giá trị thô của từng tham số | None]).
+    `tail` = [(hàm_kiểm_tra, bắt_buộc), ...] theo thứ tự đứng sau mã/tên dây.
+    - args[0] là mã số (`1`, `#1`): tham số lấy theo vị trí args[1], args[2], ... như cú pháp cũ
+      (handler tự kiểm tra giá trị).
+    - Ngược lại là tên (có thể nhiều từ): bóc từ cuối lên, chỉ bóc token qua được hàm kiểm tra và
+      luôn chừa ít nhất một từ cho tên. Tham số tuỳ chọn không bị bóc khi cả cụm đã đúng là tên
+      một dây (vd. dây “Hụi Lãi” với /hottot). Tên dây kết thúc bằng token giống tham số bắt buộc
+      (số kỳ, số tiền, HH:MM) thì nên dùng mã dây.
+    Thiếu tham số bắt buộc → None."""
+    args = list(args or [])
+    if not args: return None
+    if re.fullmatch(r"#?\d+", args[0]):
+        vals = [args[1 + i] if 1 + i < len(args) else None for i in range(len(tail))]
+        if any(v is None and required for v, (_, required) in zip(vals, tail)): return None
+        return args[0], vals
+    vals = [None] * len(tail)
+    for i in range(len(tail) - 1, -1, -1):
+        check, required = tail[i]
+        if len(args) > 1 and check(args[-1]) and (required or not _is_line_name(" ".join(args))):
+            vals[i] = args.pop()
+        elif required:
+            return None
+    return " ".join(args), vals
+
 async def cmd_tham(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
     chat_id = upd.effective_chat.id
-    if len(ctx.args) >= 3:
+    parsed = split_line_args(ctx.args, [(_is_round, True), (_is_money, True), (_looks_like_date, False)])
+    if parsed:
+        ref, (k_raw, bid_raw, date_raw) = parsed
         try:
-            line_id = _int_like(ctx.args[0])
-            k       = _int_like(ctx.args[1])
-            bid     = parse_money(ctx.args[2])
-            rdate   = None
-            if len(ctx.args) >= 4:
-                rdate = to_iso_str(parse_user_date(ctx.args[3]))
+            k     = _int_like(k_raw)
+            bid   = parse_money(bid_raw)
+            rdate = to_iso_str(parse_user_date(date_raw)) if date_raw else None
         except Exception as e:
             start_session(chat_id, "tham", ["maday","ky","sotientham","ngay"], "/tham")
             return await upd.message.reply_text(f"⚠️ Tham số chưa đúng ({e}).\n\n" + tham_wizard_text(), parse_mode="Markdown")
+        line_id, err = resolve_line_id(ref)
+        if line_id is None: return await upd.message.reply_text(err)
         await _save_tham(upd, line_id, k, bid, rdate)
         return
     start_session(chat_id, "tham", ["maday","ky","sotientham","ngay"], "/tham")
@@ -422,30 +706,33 @@ async def _save_tham(upd: Update, line_id: int, k: int, bid: int, rdate_iso: Opt
             f"❌ Thăm phải trong [{min_bid:,} .. {max_bid:,}] VND "
             f"(Sàn {line['base_rate']}% · Trần {line['cap_rate']}% · M={M:,})"
         )
+    prev_bid = get_bids(line_id).get(k)
     conn = db()
-    conn.execute("""
-        INSERT INTO rounds(line_id,k,bid,round_date) VALUES(?,?,?,?)
-        ON CONFLICT(line_id,k) DO UPDATE SET bid=excluded.bid, round_date=excluded.round_date
-    """, (line_id, k, bid, rdate_iso))
+    append_event(conn, line_id, "round_set", {"k": k, "bid": bid, "round_date": rdate_iso, "prev_bid": prev_bid},
+                 actor=_actor(upd))
     conn.commit(); conn.close()
     await upd.message.reply_text(
         f"✅ Lưu thăm kỳ {k} cho dây #{line_id}: {bid:,} VND" + (f" · ngày {to_user_str(parse_iso(rdate_iso))}" if rdate_iso else "")
+        + (f" (sửa từ {prev_bid:,})" if prev_bid is not None and prev_bid != bid else "")
     )
 
 # ----- HẸN -----
 async def cmd_set_remind(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    if len(ctx.args) != 2:
-        return await upd.message.reply_text("❌ Cú pháp: /hen <mã_dây> <HH:MM>  (VD: /hen 1 07:45)")
+    parsed = split_line_args(ctx.args, [(_is_hhmm, True)])
+    if not parsed:
+        return await upd.message.reply_text("❌ Cú pháp: /hen <mã_dây|tên> <HH:MM>  (VD: /hen 1 07:45)")
+    ref, (hhmm,) = parsed
     try:
-        line_id = _int_like(ctx.args[0])
-        hh, mm = ctx.args[1].split(":"); hh = int(hh); mm = int(mm)
+        hh, mm = hhmm.split(":"); hh = int(hh); mm = int(mm)
         if not (0 <= hh <= 23 and 0 <= mm <= 59): raise ValueError("giờ/phút không hợp lệ")
     except Exception as e:
         return await upd.message.reply_text(f"❌ Tham số không hợp lệ: {e}")
+    line_id, err = resolve_line_id(ref)
+    if line_id is None: return await upd.message.reply_text(err)
     line, _ = load_line_full(line_id)
     if not line: return await upd.message.reply_text("❌ Không tìm thấy dây.")
     conn = db()
-    conn.execute("UPDATE lines SET remind_hour=?, remind_min=? WHERE id=?", (hh, mm, line_id))
+    append_event(conn, line_id, "remind_set", {"remind_hour": hh, "remind_min": mm}, actor=_actor(upd))
     conn.commit(); conn.close()
     await upd.message.reply_text(f"✅ Đã đặt giờ nhắc cho dây #{line_id}: {hh:02d}:{mm:02d}")
 
@@ -453,12 +740,28 @@ async def cmd_set_remind(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
 async def cmd_list(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
     await upd.message.reply_text(list_text(), parse_mode="Markdown")
 
+async def cmd_search(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    if not ctx.args: return await upd.message.reply_text("❌ Cú pháp: /tim <từ_khoá>  (VD: /tim hui 10tr)")
+    q = " ".join(ctx.args)
+    rows = search_lines(q)
+    if not rows: return await upd.message.reply_text(f"🔍 Không tìm thấy dây nào khớp “{q}”.")
+    out = [f"🔍 Kết quả cho “{q}”:"] + [f"• #{r[0]} · {r[1]} · {r[2]}" for r in rows]
+    await upd.message.reply_text("\n".join(out))
+
 async def cmd_summary(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    try: line_id = _int_like(ctx.args[0])
-    except Exception: return await upd.message.reply_text("❌ Cú pháp: /tomtat <mã_dây>")
-    line, _ = load_line_full(line_id)
-    if not line: return await upd.message.reply_text("❌ Không tìm thấy dây.")
-    bids = get_bids(line_id)
+    if not ctx.args: return await upd.message.reply_text("❌ Cú pháp: /tomtat <mã_dây|tên> [DD-MM-YYYY]")
+    ref, (date_raw,) = split_line_args(ctx.args, [(_looks_like_date, False)])
+    try: as_of = parse_user_date(date_raw) if date_raw else None
+    except Exception: return await upd.message.reply_text("❌ Cú pháp: /tomtat <mã_dây|tên> [DD-MM-YYYY]")
+    line_id, err = resolve_line_id(ref)
+    if line_id is None: return await upd.message.reply_text(err)
+    if as_of:
+        line, bids = load_line_as_of(line_id, as_of)
+        if not line: return await upd.message.reply_text(f"❌ Dây #{line_id} chưa tồn tại vào ngày {to_user_str(as_of)}.")
+    else:
+        line, _ = load_line_full(line_id)
+        if not line: return await upd.message.reply_text("❌ Không tìm thấy dây.")
+        bids = get_bids(line_id)
     M, N = int(line["contrib"]), int(line["legs"])
     cfg_line = f"Sàn {float(line.get('base_rate',0)):.2f}% · Trần {float(line.get('cap_rate',100)):.2f}% · Đầu thảo {float(line.get('thau_rate',0)):.2f}% (trên M)"
     k_now = max(1, min(len(bids)+1, N))
@@ -472,17 +775,46 @@ async def cmd_summary(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
         f"• Kỳ hiện tại ước tính: {k_now} · Payout: {po:,} · Đã đóng: {paid:,} → Lãi: {int(round(p)):,} (ROI {roi_to_str(r)})",
         f"⭐ Đề xuất (ROI): kỳ {bestk} · ngày {to_user_str(k_date(line,bestk))} · Payout {bpo:,} · Đã đóng {bpaid:,} · Lãi {int(round(bp)):,} · ROI {roi_to_str(br)}"
     ]
-    if is_finished(line): msg.append("✅ Dây đã đến hạn — /dong để lưu trữ.")
+    if as_of: msg.insert(0, f"🕰️ Trạng thái tính đến hết ngày {to_user_str(as_of)}")
+    elif is_finished(line): msg.append("✅ Dây đã đến hạn — /dong để lưu trữ.")
     await upd.message.reply_text("\n".join(msg))
 
+def _event_text(kind: str, p: dict) -> str:
+    if kind == "line_created":
+        return f"Tạo dây “{p.get('name')}” · chân {p.get('legs')} · M {int(p.get('contrib') or 0):,}"
+    if kind == "round_set":
+        txt = f"Thăm k{p['k']}: {int(p['bid']):,}"
+        if p.get("prev_bid") is not None: txt += f" (trước: {int(p['prev_bid']):,})"
+        if p.get("round_date"): txt += f" · ngày {to_user_str(parse_iso(p['round_date']))}"
+        return txt
+    if kind == "remind_set":
+        return f"Giờ nhắc → {int(p['remind_hour']):02d}:{int(p['remind_min']):02d}"
+    if kind == "status_set":
+        return f"Trạng thái → {p['status']}"
+    return kind
+
+async def cmd_history(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    if not ctx.args: return await upd.message.reply_text("❌ Cú pháp: /lichsu <mã_dây|tên>")
+    line_id, err = resolve_line_id(" ".join(ctx.args))
+    if line_id is None: return await upd.message.reply_text(err)
+    events = load_events(line_id)
+    if not events: return await upd.message.reply_text("❌ Không tìm thấy dây.")
+    out = [f"📜 Lịch sử dây #{line_id} ({len(events)} sự kiện gần nhất):"]
+    for ts, actor, kind, p in events:
+        when = datetime.fromisoformat(ts).strftime("%d-%m-%Y %H:%M")
+        out.append(f"• {when} · {actor or '?'} · {_event_text(kind, p)}")
+    await upd.message.reply_text("\n".join(out))
+
 async def cmd_whenhot(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    if len(ctx.args) < 1: return await upd.message.reply_text("❌ Cú pháp: /hottot <mã_dây> [Roi%|Lãi]")
-    try: line_id = _int_like(ctx.args[0])
-    except Exception: return await upd.message.reply_text("❌ mã_dây phải là số.")
+    parsed = split_line_args(ctx.args, [(_is_metric, False)])
+    if not parsed: return await upd.message.reply_text("❌ Cú pháp: /hottot <mã_dây|tên> [Roi%|Lãi]")
+    ref, (metric_raw,) = parsed
     metric = "roi"
-    if len(ctx.args) >= 2:
-        raw = strip_accents(ctx.args[1].strip().lower().replace("%", ""))
+    if metric_raw:
+        raw = strip_accents(metric_raw.strip().lower().replace("%", ""))
         if raw in ("roi", "lai"): metric = raw
+    line_id, err = resolve_line_id(ref)
+    if line_id is None: return await upd.message.reply_text(err)
     line, _ = load_line_full(line_id)
     if not line: return await upd.message.reply_text("❌ Không tìm thấy dây.")
     bids = get_bids(line_id)
@@ -497,10 +829,13 @@ async def cmd_whenhot(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
     )
 
 async def cmd_close(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    try: line_id = _int_like(ctx.args[0])
-    except Exception: return await upd.message.reply_text("❌ Cú pháp: /dong <mã_dây>")
+    if not ctx.args: return await upd.message.reply_text("❌ Cú pháp: /dong <mã_dây|tên>")
+    line_id, err = resolve_line_id(" ".join(ctx.args))
+    if line_id is None: return await upd.message.reply_text(err)
+    line, _ = load_line_full(line_id)
+    if not line: return await upd.message.reply_text("❌ Không tìm thấy dây.")
     conn = db()
-    conn.execute("UPDATE lines SET status='CLOSED' WHERE id=?", (line_id,))
+    append_event(conn, line_id, "status_set", {"status": "CLOSED"}, actor=_actor(upd))
     conn.commit(); conn.close()
     await upd.message.reply_text(f"🗂️ Đã đóng & lưu trữ dây #{line_id}.")
 
@@ -627,7 +962,9 @@ async def handle_text(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
                                          data["menhgia"], data["san"], data["tran"], data["thau"])
         elif mode == "tham":
             rdate = to_iso_str(parse_user_date(data["ngay"])) if data.get("ngay") else None
-            await _save_tham(upd, _int_like(data["maday"]), _int_like(data["ky"]), parse_money(data["sotientham"]), rdate)
+            line_id, err = resolve_line_id(data["maday"])
+            if line_id is None: return await upd.message.reply_text(err)
+            await _save_tham(upd, line_id, _int_like(data["ky"]), parse_money(data["sotientham"]), rdate)
         end_session(chat_id)
     except Exception as e:
         await upd.message.reply_text(f"❌ Lỗi xử lý: {e}")
@@ -635,6 +972,9 @@ async def handle_text(upd: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ---------- MAIN ----------
 def main():
     init_db(); ensure_schema()
+    if os.getenv("REBUILD_PROJECTIONS", "").strip() == "1":
+        rebuild_projections()
+        print("🔧 Đã dựng lại lines/rounds từ nhật ký sự kiện.")
     app = ApplicationBuilder().token(TOKEN).post_init(_post_init).build()
 
     # Command handlers
@@ -645,7 +985,9 @@ def main():
     app.add_handler(CommandHandler("tham",     cmd_tham))
     app.add_handler(CommandHandler("hen",      cmd_set_remind))
     app.add_handler(CommandHandler("danhsach", cmd_list))
+    app.add_handler(CommandHandler("tim",      cmd_search))
     app.add_handler(CommandHandler("tomtat",   cmd_summary))
+    app.add_handler(CommandHandler("lichsu",   cmd_history))
     app.add_handler(CommandHandler("hottot",   cmd_whenhot))
     app.add_handler(CommandHandler("dong",     cmd_close))
     app.add_handler(CommandHandler("huy",      cmd_cancel))